@@ -1,11 +1,13 @@
 """
 Query Planner Agent - Decomposes complex queries into sub-queries.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
-import json
-import groq
+from collections import OrderedDict
+import hashlib
+import orjson
 from app.config import get_settings
+from app.utils.groq_client import get_groq_client
 
 
 @dataclass
@@ -21,11 +23,16 @@ class QueryPlanner:
     def __init__(self):
         """Initialize with Groq client."""
         settings = get_settings()
-        self.client = groq.Groq(api_key=settings.groq_api_key)
+        self.client = get_groq_client()
         self.model = settings.planner_model
         self.temperature = settings.planner_temperature
+        
+        # LRU of parsed plans for repeated queries. Only touched between awaits,
+        # so event-loop access needs no lock
+        self._plan_cache: "OrderedDict[str, List[SubQuery]]" = OrderedDict()
+        self._plan_cache_size = settings.plan_cache_size
     
-    def plan(self, query: str) -> List[SubQuery]:
+    async def plan(self, query: str) -> List[SubQuery]:
         """
         Decompose a complex query into atomic, parallel sub-queries.
         
@@ -35,6 +42,72 @@ class QueryPlanner:
         Returns:
             List of SubQuery objects that can be searched in parallel
         """
+        cache_key = self._cache_key(query)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(query),
+                temperature=self.temperature,
+                max_tokens=500,
+                response_format={"type": "json_object"}
+            )
+            
+            content = response.choices[0].message.content
+            
+            # Parse the JSON response; the prompt pins the {"sub_queries": [...]} shape
+            try:
+                if content is None:
+                    return [SubQuery(text=query, priority=1)]
+                sub_queries_data = orjson.loads(content)
+                
+                # Convert to SubQuery objects
+                sub_queries = [
+                    sq for sq in map(_to_sub_query, sub_queries_data.get("sub_queries", [])) if sq
+                ]
+                
+                # If parsing failed, return single query
+                if not sub_queries:
+                    return [SubQuery(text=query, priority=1)]
+                
+                self._cache_put(cache_key, sub_queries)
+                return sub_queries
+                
+            except (orjson.JSONDecodeError, AttributeError):
+                # Fallback: treat entire query as single sub-query
+                return [SubQuery(text=query, priority=1)]
+                
+        except Exception as e:
+            print(f"Error in query planning: {e}")
+            return [SubQuery(text=query, priority=1)]
+    
+    def _cache_key(self, query: str) -> str:
+        """Cache key covering everything that determines the plan."""
+        return hashlib.blake2b(
+            f"{self.model}|{self.temperature}|{query}".encode(),
+            digest_size=16
+        ).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[List[SubQuery]]:
+        """Look up a cached plan, marking it as recently used."""
+        sub_queries = self._plan_cache.get(key)
+        if sub_queries is None:
+            return None
+        self._plan_cache.move_to_end(key)
+        return list(sub_queries)
+    
+    def _cache_put(self, key: str, sub_queries: List[SubQuery]) -> None:
+        """Store a plan, evicting the least recently used ones over capacity."""
+        self._plan_cache[key] = list(sub_queries)
+        self._plan_cache.move_to_end(key)
+        while len(self._plan_cache) > self._plan_cache_size:
+            self._plan_cache.popitem(last=False)
+    
+    def _build_messages(self, query: str) -> List[Dict[str, str]]:
+        """Build the planning chat messages."""
         prompt = f"""You are a Query Planning Agent. Your task is to decompose a complex user query into simple, parallel sub-queries that can be searched independently.
 
 User Query: "{query}"
@@ -46,84 +119,41 @@ Analyze this query and break it down into 1-4 atomic sub-queries that:
 4. Cover all aspects of the original query
 
 Instructions:
-- Return ONLY a JSON array
-- Each object must have "query" and "priority" fields
+- Return ONLY a JSON object with a "sub_queries" array
+- Each array item must have "query" and "priority" fields
 - Priority is 1 (highest) to 3 (lowest)
 - Queries should be specific, not generic
 
 Example 1:
 Query: "How do I deploy to AWS with Docker?"
-Response: [
+Response: {{"sub_queries": [
   {{"query": "AWS ECS deployment prerequisites and setup", "priority": 1}},
   {{"query": "Docker image build and push to ECR", "priority": 1}},
   {{"query": "ECS task definition and service configuration", "priority": 2}}
-]
+]}}
 
 Example 2:
 Query: "What database does CloudSync use and how is data synchronized?"
-Response: [
+Response: {{"sub_queries": [
   {{"query": "CloudSync database technology and configuration", "priority": 1}},
   {{"query": "Data synchronization architecture and flow", "priority": 1}},
   {{"query": "Conflict resolution strategies", "priority": 2}}
-]
+]}}
 
-Your response (JSON array only):
+Your response (JSON object only):
 """
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a query planning assistant. Output only valid JSON arrays."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=500,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Parse the JSON response
-            try:
-                if content is None:
-                    return [SubQuery(text=query, priority=1)]
-                sub_queries_data = json.loads(content)
-                
-                # Handle both direct array and object with array
-                if isinstance(sub_queries_data, list):
-                    sub_queries_list = sub_queries_data
-                elif isinstance(sub_queries_data, dict):
-                    # Try common keys
-                    for key in ["sub_queries", "queries", "results"]:
-                        if key in sub_queries_data:
-                            sub_queries_list = sub_queries_data[key]
-                            break
-                    else:
-                        # If it's a dict but not recognized, treat values as queries
-                        sub_queries_list = list(sub_queries_data.values()) if sub_queries_data else []
-                else:
-                    sub_queries_list = []
-                
-                # Convert to SubQuery objects
-                sub_queries = []
-                for sq in sub_queries_list:
-                    if isinstance(sq, dict):
-                        text = sq.get("query", sq.get("text", ""))
-                        priority = sq.get("priority", 1)
-                        if text:
-                            sub_queries.append(SubQuery(text=text, priority=priority))
-                
-                # If parsing failed, return single query
-                if not sub_queries:
-                    sub_queries = [SubQuery(text=query, priority=1)]
-                
-                return sub_queries
-                
-            except json.JSONDecodeError:
-                # Fallback: treat entire query as single sub-query
-                return [SubQuery(text=query, priority=1)]
-                
-        except Exception as e:
-            print(f"Error in query planning: {e}")
-            return [SubQuery(text=query, priority=1)]
+        return [
+            {"role": "system", "content": "You are a query planning assistant. Output only valid JSON objects."},
+            {"role": "user", "content": prompt}
+        ]
+
+
+def _to_sub_query(item: Any) -> Optional[SubQuery]:
+    """Convert one parsed planner item to a SubQuery, or None if it has no text."""
+    if not isinstance(item, dict):
+        return None
+    text = item.get("query", item.get("text", ""))
+    if not text:
+        return None
+    return SubQuery(text=text, priority=item.get("priority", 1))
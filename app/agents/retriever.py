@@ -3,12 +3,18 @@ Retriever Agent - Handles vector search operations.
 """
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+import heapq
+import threading
 import numpy as np
 from app.core.vector_store import VectorStore
 from app.core.embeddings import EmbeddingGenerator
 from app.agents.planner import SubQuery
 
 
+# Up to 4 sub-queries from the planner, doubled by query expansion on retry
+MAX_SUBQUERIES = 8
+
+
 @dataclass
 class RetrievedChunk:
     """A retrieved document chunk with metadata."""
@@ -26,11 +32,14 @@ class RetrieverAgent:
         """Initialize with vector store and embedding generator."""
         self.vector_store = vector_store if vector_store is not None else VectorStore()
         self.embedding_gen = embedding_gen if embedding_gen is not None else EmbeddingGenerator()
+        # Per-thread so concurrent retrievals never share embedding rows
+        self._arena_local = threading.local()
     
     def retrieve_parallel(
         self,
         sub_queries: List[SubQuery],
-        top_k: int = 5
+        top_k: int = 5,
+        max_return: Optional[int] = None
     ) -> List[RetrievedChunk]:
         """
         Execute parallel retrieval for all sub-queries.
@@ -38,53 +47,79 @@ class RetrieverAgent:
         Args:
             sub_queries: List of sub-queries from planner
             top_k: Number of chunks to retrieve per query
+            max_return: Maximum number of chunks to return (default: top_k per sub-query)
             
         Returns:
-            List of unique RetrievedChunk objects
+            List of unique RetrievedChunk objects, most relevant first
         """
+        if not sub_queries:
+            return []
+        
         all_chunks = []
         seen_ids = set()
         
-        for sub_query in sub_queries:
-            # Generate embedding for this sub-query
-            query_embedding = self.embedding_gen.embed_single(sub_query.text)
+        # Embed all sub-queries in a single batched forward pass (cache hits skip the model),
+        # writing rows straight into the reusable arena
+        query_embeddings = self.embedding_gen.embed_into(
+            [sq.text for sq in sub_queries],
+            self._embed_arena(len(sub_queries))
+        )
+        
+        # Query vector store for all sub-queries in a single call
+        results = self.vector_store.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k
+        )
+        
+        # Process results; each result field is a list indexed by sub-query
+        if results and results.get('documents'):
+            all_documents = results['documents']
+            all_distances = results.get('distances') or [[0] * len(documents) for documents in all_documents]
             
-            # Query vector store
-            results = self.vector_store.query(
-                query_embedding=query_embedding,
-                n_results=top_k
-            )
+            # Convert cosine distance to similarity score (lower distance = higher similarity)
+            # for every result row at once. Chroma uses cosine distance where 0 = identical,
+            # 2 = opposite; missing distances (None -> NaN) get a neutral 0.5
+            distances = np.array([d for row in all_distances for d in row], dtype=np.float64)
+            similarities = np.where(
+                np.isnan(distances),
+                0.5,
+                np.clip(1.0 - distances * 0.5, 0.0, 1.0)
+            ).tolist()
             
-            # Process results
-            if results and results.get('documents') and len(results['documents']) > 0:
-                documents = results['documents'][0]
-                metadatas = results.get('metadatas', [{}])[0] if results.get('metadatas') else [{}] * len(documents)
-                ids = results.get('ids', [[]])[0] if results.get('ids') else [''] * len(documents)
-                distances = results.get('distances', [[]])[0] if results.get('distances') else [0] * len(documents)
+            offset = 0
+            for i, documents in enumerate(all_documents):
+                metadatas = results['metadatas'][i] if results.get('metadatas') else [{}] * len(documents)
+                ids = results['ids'][i] if results.get('ids') else [''] * len(documents)
+                row_similarities = similarities[offset:offset + len(documents)]
+                offset += len(documents)
                 
-                for idx, (doc, metadata, doc_id, distance) in enumerate(zip(documents, metadatas, ids, distances)):
+                for doc, metadata, doc_id, similarity in zip(documents, metadatas, ids, row_similarities):
                     # Skip duplicates
                     if doc_id in seen_ids:
                         continue
                     seen_ids.add(doc_id)
                     
-                    # Convert cosine distance to similarity score (lower distance = higher similarity)
-                    # Chroma uses cosine distance where 0 = identical, 2 = opposite
-                    similarity = 1 - (distance / 2) if distance is not None else 0.5
-                    
                     chunk = RetrievedChunk(
                         content=doc,
                         document=metadata.get('document', 'unknown'),
                         section=metadata.get('section', 'unknown'),
-                        relevance_score=max(0.0, min(1.0, similarity)),
+                        relevance_score=similarity,
                         chunk_id=doc_id
                     )
                     all_chunks.append(chunk)
         
-        # Sort by relevance score (descending)
-        all_chunks.sort(key=lambda x: x.relevance_score, reverse=True)
-        
-        return all_chunks
+        # Keep only the most relevant chunks, sorted by relevance score (descending)
+        if max_return is None:
+            max_return = top_k * len(sub_queries)
+        return heapq.nlargest(max_return, all_chunks, key=lambda x: x.relevance_score)
+    
+    def _embed_arena(self, n_rows: int) -> np.ndarray:
+        """Get this thread's preallocated float32 embedding buffer, growing it if needed."""
+        arena = getattr(self._arena_local, "buffer", None)
+        if arena is None or len(arena) < n_rows:
+            arena = np.empty((max(n_rows, MAX_SUBQUERIES), self.embedding_gen.dimension), dtype=np.float32)
+            self._arena_local.buffer = arena
+        return arena
     
     def retrieve_single(self, query: str, top_k: int = 5) -> List[RetrievedChunk]:
         """Convenience method for single query retrieval."""
@@ -2,20 +2,37 @@
 Synthesizer Agent - Generates final response with citations.
 """
 from typing import List, AsyncGenerator, Union
-import groq
 from app.config import get_settings
+from app.utils.groq_client import get_groq_client
 from app.agents.validator import ValidatedChunk
 
 
+# Fixed instructions sent as the system message, so they form an identical
+# prompt prefix on every request and only the question and context vary
+SYNTH_SYSTEM = """You are a helpful technical documentation assistant. Answer the user's question based on the provided context.
+
+Instructions:
+1. Answer directly based ONLY on the provided context
+2. Use citation markers like [1], [2], etc. when referencing specific information
+3. Be concise but complete
+4. If information is missing, say so explicitly
+5. Structure the answer with clear steps or points where applicable
+
+Format your response with inline citations. Example: "To deploy [1], you need to build the Docker image first [2]."
+"""
+
+
 class SynthesizerAgent:
     """Agent that synthesizes validated chunks into a coherent response."""
     
     def __init__(self):
         """Initialize with Groq client."""
         settings = get_settings()
-        self.client = groq.Groq(api_key=settings.groq_api_key)
+        self.client = get_groq_client()
         self.model = settings.synthesizer_model
         self.temperature = settings.synthesizer_temperature
+        self.chunk_chars = settings.synth_chunk_chars
+        self.max_context_chunks = 5  # Top chunks included in the prompt
     
     async def synthesize(
         self,
@@ -49,12 +66,12 @@ class SynthesizerAgent:
         """Build context string from validated chunks."""
         context_parts = []
         
-        for i, vc in enumerate(validated_chunks[:5], 1):  # Top 5 chunks
+        for i, vc in enumerate(validated_chunks[:self.max_context_chunks], 1):
             chunk = vc.chunk
             context_parts.append(
                 f"[{i}] Document: {chunk.document} (Section: {chunk.section})\n"
                 f"Relevance: {vc.confidence:.2f}\n"
-                f"Content: {chunk.content}\n"
+                f"Content: {chunk.content[:self.chunk_chars]}\n"
             )
         
         return "\n---\n".join(context_parts)
@@ -65,32 +82,16 @@ class SynthesizerAgent:
         context: str,
         validated_chunks: List[ValidatedChunk]
     ) -> str:
-        """Build the synthesis prompt."""
-        return f"""You are a helpful technical documentation assistant. Answer the user's question based on the provided context.
-
-User Question: {query}
-
-Context from documentation:
-{context}
-
-Instructions:
-1. Answer directly based ONLY on the provided context
-2. Use citation markers like [1], [2], etc. when referencing specific information
-3. Be concise but complete
-4. If information is missing, say so explicitly
-5. Structure the answer with clear steps or points where applicable
-
-Format your response with inline citations. Example: "To deploy [1], you need to build the Docker image first [2]."
-
-Answer:"""
+        """Build the synthesis prompt (dynamic part only; instructions are in SYNTH_SYSTEM)."""
+        return f"Question: {query}\n\nContext:\n{context}"
     
     async def _generate_complete(self, prompt: str) -> str:
         """Generate complete response."""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a technical documentation assistant. Provide accurate, well-cited answers."},
+                    {"role": "system", "content": SYNTH_SYSTEM},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=self.temperature,
@@ -105,10 +106,10 @@ Answer:"""
     async def _generate_stream(self, prompt: str) -> AsyncGenerator[str, None]:
         """Generate streaming response."""
         try:
-            stream = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a technical documentation assistant. Provide accurate, well-cited answers."},
+                    {"role": "system", "content": SYNTH_SYSTEM},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=self.temperature,
@@ -116,9 +117,14 @@ Answer:"""
                 stream=True
             )
             
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            try:
+                async for chunk in stream:
+                    # Trailing chunks (e.g. usage stats) may carry no choices
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Release the pooled connection even if the client disconnects mid-stream
+                await stream.response.aclose()
                     
         except Exception as e:
             yield f"Error in stream: {str(e)}"
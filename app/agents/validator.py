@@ -1,11 +1,12 @@
 """
 Validator Agent - Validates retrieved chunks for relevance.
 """
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 import json
-import groq
+import numpy as np
 from app.config import get_settings
+from app.utils.groq_client import get_groq_client
 from app.agents.retriever import RetrievedChunk
 from app.agents.planner import SubQuery
 
@@ -24,12 +25,13 @@ class ValidatorAgent:
     def __init__(self, min_confidence: float = 0.0):
         """Initialize with Groq client and threshold."""
         settings = get_settings()
-        self.client = groq.Groq(api_key=settings.groq_api_key)
+        self.client = get_groq_client()
         self.model = settings.validator_model
         self.temperature = settings.validator_temperature
         self.min_confidence = min_confidence if min_confidence > 0 else settings.validation_threshold
+        self.use_llm = settings.validator_use_llm
     
-    def validate_batch(
+    async def validate_batch(
         self,
         chunks: List[RetrievedChunk],
         sub_queries: List[SubQuery],
@@ -49,30 +51,47 @@ class ValidatorAgent:
         if not chunks:
             return [], [sq.text for sq in sub_queries], True
         
-        validated = []
         missing_topics = []
         
-        # Validate each chunk
-        for chunk in chunks:
-            confidence, reasoning = self._validate_single(chunk, original_query)
-            
-            # Medium strictness: keep if confidence >= threshold
-            if confidence >= self.min_confidence:
-                validated.append(ValidatedChunk(
-                    chunk=chunk,
-                    confidence=confidence,
-                    reasoning=reasoning
-                ))
-        
-        # Sort by confidence
-        validated.sort(key=lambda x: x.confidence, reverse=True)
-        
-        # Check coverage - which sub-queries aren't well covered
-        covered_topics = set()
-        for vc in validated[:5]:  # Check top 5
-            for sq in sub_queries:
-                if self._topic_coverage(vc.chunk, sq.text):
-                    covered_topics.add(sq.text)
+        # Tokenize the query, sub-queries and chunks exactly once; column 0 of the
+        # coverage matrix is the original query, the rest are the sub-queries
+        coverage = self._coverage_matrix(
+            [self._token_ids(chunk.content) for chunk in chunks],
+            [self._token_ids(original_query)] + [self._token_ids(sq.text) for sq in sub_queries]
+        )
+        
+        # Score all chunks at once: keyword coverage adjusted by original relevance
+        coverages = coverage[:, 0]
+        relevance = np.fromiter(
+            (chunk.relevance_score for chunk in chunks),
+            dtype=np.float64,
+            count=len(chunks)
+        )
+        confidences = 0.5 * coverages + 0.5 * relevance
+        reasonings: List[Optional[str]] = [None] * len(chunks)
+        
+        # Optionally replace heuristic scores with a single batched LLM judgement
+        if self.use_llm:
+            llm_results = await self._validate_all(chunks, original_query)
+            for i, result in llm_results.items():
+                confidences[i], reasonings[i] = result
+        
+        # Sort by confidence (stable, descending) and keep chunks above threshold
+        order = np.argsort(-confidences, kind="stable")
+        kept = order[confidences[order] >= self.min_confidence]
+        
+        validated = [
+            ValidatedChunk(
+                chunk=chunks[i],
+                confidence=float(confidences[i]),
+                reasoning=reasonings[i] or self._reasoning(confidences[i])
+            )
+            for i in kept
+        ]
+        
+        # Check coverage - which sub-queries aren't well covered by the top 5
+        covered = (coverage[kept[:5], 1:] > 0.3).any(axis=0)  # At least 30% word overlap
+        covered_topics = {sq.text for sq, is_covered in zip(sub_queries, covered) if is_covered}
         
         for sq in sub_queries:
             if sq.text not in covered_topics:
@@ -88,39 +107,118 @@ class ValidatorAgent:
         
         return validated, missing_topics, needs_reretrieval
     
-    def _validate_single(self, chunk: RetrievedChunk, query: str) -> Tuple[float, str]:
-        """Validate a single chunk using LLM."""
-        # For prototype, use simple heuristic
-        # In production, use LLM-based validation
-        
-        # Simple keyword-based validation for speed
-        query_words = set(query.lower().split())
-        chunk_words = set(chunk.content.lower().split())
-        
-        overlap = len(query_words.intersection(chunk_words))
-        coverage = overlap / len(query_words) if query_words else 0
+    async def _validate_all(
+        self,
+        chunks: List[RetrievedChunk],
+        query: str
+    ) -> Dict[int, Tuple[float, str]]:
+        """
+        Validate all chunks with a single LLM call.
         
-        # Adjust by original relevance score
-        confidence = (coverage * 0.5) + (chunk.relevance_score * 0.5)
+        Args:
+            chunks: Retrieved chunks to judge
+            query: The user's original query
+            
+        Returns:
+            Mapping of chunk index to (confidence, reasoning); chunks the LLM
+            didn't score are omitted so the caller keeps the heuristic score
+        """
+        listing = "\n\n".join(
+            f"[{i}] {chunk.content[:400]}" for i, chunk in enumerate(chunks)
+        )
+        prompt = f"""You are a Validation Agent. Judge how relevant each numbered documentation chunk is for answering the user's question.
+
+User Question: "{query}"
+
+Chunks:
+{listing}
+
+Instructions:
+- Return ONLY a JSON object of the form {{"results": [{{"id": 0, "confidence": 0.85, "reasoning": "..."}}]}}
+- Include one entry per chunk, using the chunk number as "id"
+- "confidence" is between 0.0 (irrelevant) and 1.0 (directly answers the question)
+- Keep "reasoning" to one short sentence
+
+Your response (JSON object only):
+"""
         
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are a relevance validation assistant. Output only valid JSON objects."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=100 + 60 * len(chunks),
+                response_format={"type": "json_object"}
+            )
+            
+            content = response.choices[0].message.content
+            if content is None:
+                return {}
+            
+            results = {}
+            for item in json.loads(content).get("results", []):
+                idx = int(item["id"])
+                if 0 <= idx < len(chunks):
+                    confidence = max(0.0, min(1.0, float(item["confidence"])))
+                    results[idx] = (confidence, str(item.get("reasoning", "")))
+            return results
+            
+        except Exception as e:
+            print(f"Error in LLM validation: {e}")
+            return {}
+    
+    def _reasoning(self, confidence: float) -> str:
+        """Describe a heuristic confidence score."""
         if confidence > 0.8:
-            reasoning = "High semantic relevance and keyword overlap"
+            return "High semantic relevance and keyword overlap"
         elif confidence > 0.6:
-            reasoning = "Moderate relevance, likely useful"
+            return "Moderate relevance, likely useful"
         elif confidence > 0.4:
-            reasoning = "Low relevance, may be tangential"
+            return "Low relevance, may be tangential"
         else:
-            reasoning = "Poor relevance, likely not useful"
-        
-        return confidence, reasoning
+            return "Poor relevance, likely not useful"
     
-    def _topic_coverage(self, chunk: RetrievedChunk, sub_query: str) -> bool:
-        """Check if a chunk covers a specific sub-query topic."""
-        # Simple word overlap check
-        query_words = set(sub_query.lower().split())
-        chunk_words = set(chunk.content.lower().split())
+    def _token_ids(self, text: str) -> np.ndarray:
+        """Sorted unique 32-bit hashed token IDs for a text."""
+        return np.unique(np.fromiter(
+            (hash(word) & 0xFFFFFFFF for word in text.lower().split()),
+            dtype=np.uint32
+        ))
+    
+    def _coverage_matrix(
+        self,
+        chunk_ids: List[np.ndarray],
+        query_ids: List[np.ndarray]
+    ) -> np.ndarray:
+        """
+        Compute word coverage of every query by every chunk.
+        
+        Args:
+            chunk_ids: Token IDs per chunk (from _token_ids)
+            query_ids: Token IDs per query (from _token_ids)
+            
+        Returns:
+            (n_chunks, n_queries) array of the fraction of each query's
+            tokens that appear in each chunk
+        """
+        # Only tokens that occur in some query matter
+        vocab = np.unique(np.concatenate(query_ids)) if query_ids else np.empty(0, dtype=np.uint32)
+        
+        # Chunk x vocab membership, built in one vectorized pass over all chunk tokens
+        rows = np.repeat(np.arange(len(chunk_ids)), [len(ids) for ids in chunk_ids])
+        tokens = np.concatenate(chunk_ids) if chunk_ids else np.empty(0, dtype=np.uint32)
+        in_vocab = np.isin(tokens, vocab)
+        chunk_vocab = np.zeros((len(chunk_ids), len(vocab)), dtype=np.float64)
+        chunk_vocab[rows[in_vocab], np.searchsorted(vocab, tokens[in_vocab])] = 1.0
         
-        overlap = len(query_words.intersection(chunk_words))
-        coverage_ratio = overlap / len(query_words) if query_words else 0
+        # Query x vocab membership
+        query_vocab = np.zeros((len(query_ids), len(vocab)), dtype=np.float64)
+        for j, ids in enumerate(query_ids):
+            query_vocab[j, np.searchsorted(vocab, ids)] = 1.0
         
-        return coverage_ratio > 0.3  # At least 30% word overlap
+        overlap = chunk_vocab @ query_vocab.T
+        query_sizes = query_vocab.sum(axis=1)
+        return np.divide(overlap, query_sizes, out=np.zeros_like(overlap), where=query_sizes > 0)
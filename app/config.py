@@ -2,7 +2,7 @@
 Configuration module for the RAG application.
 """
 from pydantic_settings import BaseSettings
-from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -24,12 +24,17 @@ class Settings(BaseSettings):
     # Vector Store
     vector_store_path: str = "./data/chroma_db"
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"
+    embedding_onnx_path: str = "./data/onnx_model"
+    embedding_dtype: str = "float32"
     
     # Document Processing
     chunk_size: int = 500
     chunk_overlap: int = 50
     max_retrieval_chunks: int = 10
     validation_threshold: float = 0.6
+    validator_use_llm: bool = False
+    synth_chunk_chars: int = 800
     
     # Agent Models
     planner_model: str = "llama-3.1-70b-versatile"
@@ -41,12 +46,20 @@ class Settings(BaseSettings):
     validator_temperature: float = 0.0
     synthesizer_temperature: float = 0.3
     
+    # Caching
+    plan_cache_size: int = 1024
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
 
 
-@lru_cache()
+_settings: Optional[Settings] = None
+
+
 def get_settings() -> Settings:
     """Get cached settings instance."""
-    return Settings()
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
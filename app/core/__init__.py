@@ -1,13 +1,15 @@
 """
 Core module.
 """
-from .document_loader import load_documents, Document
+from .document_loader import load_documents, iter_paragraphs, preprocess_document, Document
 from .embeddings import EmbeddingGenerator
 from .vector_store import VectorStore
 from .pipeline import RAGPipeline, RAGResult
 
 __all__ = [
     "load_documents",
+    "iter_paragraphs",
+    "preprocess_document",
     "Document",
     "EmbeddingGenerator",
     "VectorStore",
@@ -4,11 +4,17 @@ Document loading and processing utilities.
 import os
 import re
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import markdown
+import xxhash
 from dataclasses import dataclass
 
 
+_TITLE_RE = re.compile(r'^# (.+)$', re.MULTILINE)
+_HEADER_RE = re.compile(r'^(#+) (.+)$', re.MULTILINE)
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\n')
+
+
 @dataclass
 class Document:
     """Represents a processed document."""
@@ -24,28 +30,30 @@ def read_markdown_file(file_path: Path) -> Optional[Document]:
             content = f.read()
         
         # Extract title from first header
-        title_match = re.search(r'^# (.+)$', content, re.MULTILINE)
+        title_match = _TITLE_RE.search(content)
         title = title_match.group(1) if title_match else file_path.stem
         
-        # Extract sections based on headers
+        # Extract sections based on headers; each section's body runs from the
+        # end of its header line to the start of the next header
+        headers = [
+            (m.start(), m.end(), len(m.group(1)), m.group(2).strip('# '))
+            for m in _HEADER_RE.finditer(content)
+        ]
+        
         sections = []
-        current_section = {"title": "Introduction", "content": ""}
+        intro_end = headers[0][0] if headers else len(content)
+        if content[:intro_end].strip():
+            sections.append({"title": "Introduction", "content": content[:intro_end]})
         
-        for line in content.split('\n'):
-            if line.startswith('#') and not line.startswith('```'):
-                if current_section["content"].strip():
-                    sections.append(current_section)
-                level = len(line) - len(line.lstrip('#'))
-                current_section = {
-                    "title": line.strip('# '),
-                    "content": "",
+        for i, (_, header_end, level, section_title) in enumerate(headers):
+            next_start = headers[i + 1][0] if i + 1 < len(headers) else len(content)
+            section_content = content[header_end + 1:next_start]
+            if section_content.strip():
+                sections.append({
+                    "title": section_title,
+                    "content": section_content,
                     "level": level
-                }
-            else:
-                current_section["content"] += line + '\n'
-        
-        if current_section["content"].strip():
-            sections.append(current_section)
+                })
         
         return Document(
             path=str(file_path),
@@ -75,3 +83,62 @@ def load_documents(docs_path: str = "docs") -> List[Document]:
             documents.append(doc)
     
     return documents
+
+
+def iter_paragraphs(content: str, min_length: int = 50) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (index, paragraph) for each blank-line separated paragraph.
+    
+    Indexes match content.split('\n\n'), but paragraphs are produced lazily and
+    ones shorter than min_length (after stripping) are skipped.
+    """
+    start = 0
+    index = 0
+    for match in _PARAGRAPH_BREAK_RE.finditer(content):
+        # A span shorter than min_length can't pass the stripped length check
+        if match.start() - start >= min_length:
+            para = content[start:match.start()]
+            if len(para.strip()) >= min_length:
+                yield index, para
+        start = match.end()
+        index += 1
+    
+    para = content[start:]
+    if len(para.strip()) >= min_length:
+        yield index, para
+
+
+def preprocess_document(
+    doc: Document,
+    min_length: int = 50
+) -> Tuple[List[str], List[bytes], List[int], List[Dict[str, Any]]]:
+    """
+    Split a document into paragraph chunks ready for ingestion.
+    
+    Args:
+        doc: Loaded document
+        min_length: Minimum stripped paragraph length to keep
+        
+    Returns:
+        Tuple of (chunks, UTF-8 encoded chunks, content fingerprints, metadatas);
+        duplicates are not removed here so the caller can dedup across documents
+    """
+    chunks = []
+    encoded_chunks = []
+    fingerprints = []
+    metadatas = []
+    section = doc.metadata.get("title", "unknown")
+    
+    for i, para in iter_paragraphs(doc.content, min_length=min_length):
+        # Encode once: the stripped bytes are fingerprinted, the full bytes reused for IDs
+        encoded = para.encode()
+        chunks.append(para)
+        encoded_chunks.append(encoded)
+        fingerprints.append(xxhash.xxh3_64_intdigest(encoded.strip()))
+        metadatas.append({
+            "document": doc.path,
+            "section": section,
+            "paragraph": i
+        })
+    
+    return chunks, encoded_chunks, fingerprints, metadatas
@@ -2,25 +2,70 @@
 Embedding generation utilities.
 """
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Dict
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import threading
 import numpy as np
+import torch
+
+
+# Matches the max_seq_length of all-MiniLM-L6-v2 in sentence-transformers
+ONNX_MAX_LENGTH = 256
+ONNX_BATCH_SIZE = 32
 
 
 class EmbeddingGenerator:
     """Handles text embedding generation."""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        """Initialize with a sentence transformer model."""
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        cache_size: int = 5000,
+        backend: str = "torch",
+        onnx_path: str = "./data/onnx_model",
+        dtype: str = "float32"
+    ):
+        """Initialize with a sentence transformer model (PyTorch or quantized ONNX)."""
+        print(f"Loading embedding model: {model_name} (backend: {backend})")
+        self.backend = backend
+        self.half_precision = False
+        if backend == "onnx":
+            self._load_onnx(model_name, onnx_path)
+            self.dimension = self._ort_model.config.hidden_size
+        else:
+            self.model = SentenceTransformer(model_name)
+            self.dimension = self.model.get_sentence_embedding_dimension()
+            if dtype in ("float16", "bfloat16"):
+                # float16 kernels are only fast on GPU; CPUs get bfloat16 instead
+                self.model = self.model.half() if torch.cuda.is_available() else self.model.to(torch.bfloat16)
+                self.half_precision = True
+                print(f"Embedding model weights cast to {next(self.model.parameters()).dtype}")
         print(f"Model loaded. Embedding dimension: {self.dimension}")
+        
+        # LRU cache of query embeddings, shared across retriever threads
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
     
     def embed(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts."""
         if not texts:
             return np.array([])
         
+        if self.backend == "onnx":
+            return self._encode_onnx(texts)
+        
+        if self.half_precision:
+            # numpy has no bfloat16, so upcast the tensor and renormalize in float32
+            embeddings = self.model.encode(
+                texts,
+                convert_to_tensor=True,
+                show_progress_bar=len(texts) > 100
+            ).float().cpu().numpy()
+            return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        
         # Encode texts in batches for efficiency
         embeddings = self.model.encode(
             texts,
@@ -30,6 +75,103 @@ class EmbeddingGenerator:
         
         return embeddings
     
+    def embed_into(self, texts: List[str], out: np.ndarray) -> np.ndarray:
+        """
+        Write query embeddings into a preallocated float32 buffer, reusing cached vectors.
+        
+        Args:
+            texts: Query texts to embed
+            out: Buffer of shape (>= len(texts), dimension) owned by the caller
+            
+        Returns:
+            View of the first len(texts) rows of out
+        """
+        keys = [self._cache_key(text) for text in texts]
+        missing: Dict[bytes, List[int]] = {}
+        
+        with self._cache_lock:
+            for row, key in enumerate(keys):
+                embedding = self._cache.get(key)
+                if embedding is not None:
+                    self._cache.move_to_end(key)
+                    out[row] = embedding
+                else:
+                    missing.setdefault(key, []).append(row)
+        
+        # Encode only the texts we haven't seen, in a single batch
+        if missing:
+            embeddings = self.embed([texts[rows[0]] for rows in missing.values()])
+            with self._cache_lock:
+                for (key, rows), embedding in zip(missing.items(), embeddings):
+                    out[rows] = embedding
+                    # Cache a copy so later writes to out don't clobber it
+                    self._cache[key] = out[rows[0]].copy()
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        
+        return out[:len(texts)]
+    
     def embed_single(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
-        return self.embed([text])[0]
+        out = np.empty((1, self.dimension), dtype=np.float32)
+        return self.embed_into([text], out)[0]
+    
+    def _load_onnx(self, model_name: str, onnx_path: str) -> None:
+        """Export the model to ONNX with dynamic INT8 quantization, reusing a previous export."""
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The onnx embedding backend requires optimum: pip install optimum[onnxruntime]"
+            ) from e
+        
+        save_dir = Path(onnx_path)
+        if not (save_dir / "model_quantized.onnx").exists():
+            print(f"Exporting quantized ONNX model to {save_dir}")
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(ort_model)
+            quantizer.quantize(
+                save_dir=save_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+        
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        
+        self._ort_model = ORTModelForFeatureExtraction.from_pretrained(
+            save_dir,
+            file_name="model_quantized.onnx",
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+        self._tokenizer = AutoTokenizer.from_pretrained(save_dir)
+    
+    def _encode_onnx(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with the ONNX model: mean pooling followed by L2 normalization."""
+        batches = []
+        for start in range(0, len(texts), ONNX_BATCH_SIZE):
+            inputs = self._tokenizer(
+                texts[start:start + ONNX_BATCH_SIZE],
+                padding=True,
+                truncation=True,
+                max_length=ONNX_MAX_LENGTH,
+                return_tensors="np"
+            )
+            token_embeddings = self._ort_model(**inputs).last_hidden_state
+            
+            # Mean-pool over real tokens only
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            
+            batches.append(pooled / np.linalg.norm(pooled, axis=1, keepdims=True))
+        
+        return np.concatenate(batches, axis=0).astype(np.float32, copy=False)
+    
+    def _cache_key(self, text: str) -> bytes:
+        """Fixed-size cache key so long texts don't bloat the cache."""
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
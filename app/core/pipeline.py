@@ -1,14 +1,15 @@
 """
 Main orchestration pipeline for the RAG system.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncGenerator, Tuple
+import asyncio
 import time
 from dataclasses import dataclass
 from app.config import get_settings
 from app.agents.planner import QueryPlanner, SubQuery
 from app.agents.retriever import RetrieverAgent, RetrievedChunk
 from app.agents.validator import ValidatorAgent, ValidatedChunk
-from app.agents.synthesizer import SynthesizerAgent
+from app.agents.synthesizer import SynthesizerAgent, SYNTH_SYSTEM
 from app.core.vector_store import VectorStore
 from app.core.embeddings import EmbeddingGenerator
 from app.models import Source, QueryMetadata
@@ -31,7 +32,12 @@ class RAGPipeline:
         
         # Initialize core components
         self.vector_store = VectorStore(settings.vector_store_path)
-        self.embedding_gen = EmbeddingGenerator(settings.embedding_model)
+        self.embedding_gen = EmbeddingGenerator(
+            settings.embedding_model,
+            backend=settings.embedding_backend,
+            onnx_path=settings.embedding_onnx_path,
+            dtype=settings.embedding_dtype
+        )
         
         # Initialize agents
         self.planner = QueryPlanner()
@@ -54,21 +60,93 @@ class RAGPipeline:
         """
         start_time = time.time()
         
+        # Steps 1-3: Plan, retrieve and validate
+        sub_queries, validated = await self._prepare(query, max_sources)
+        
+        # Step 4: Synthesize - Generate response
+        answer = await self.synthesizer.synthesize(query, validated[:max_sources])
+        
+        return RAGResult(
+            answer=answer,
+            sources=self._build_sources(validated, max_sources),
+            metadata=self._build_metadata(start_time, query, answer, sub_queries, validated, max_sources)
+        )
+    
+    async def astream(
+        self,
+        query: str,
+        max_sources: int = 5
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Process a query, streaming the answer as the LLM generates it.
+        
+        Args:
+            query: User's natural language query
+            max_sources: Maximum number of sources to include
+            
+        Yields:
+            (kind, payload) events: one ("token", text) per answer token, then
+            ("sources", list), ("metadata", dict) and finally ("done", True)
+        """
+        start_time = time.time()
+        
+        # Steps 1-3: Plan, retrieve and validate
+        sub_queries, validated = await self._prepare(query, max_sources)
+        
+        # Step 4: Synthesize - forward tokens as soon as they arrive
+        answer_parts = []
+        tokens = await self.synthesizer.synthesize(query, validated[:max_sources], stream=True)
+        async for token in tokens:
+            answer_parts.append(token)
+            yield "token", token
+        answer = "".join(answer_parts)
+        
+        sources = self._build_sources(validated, max_sources)
+        yield "sources", [source.model_dump() for source in sources]
+        
+        metadata = self._build_metadata(start_time, query, answer, sub_queries, validated, max_sources)
+        yield "metadata", metadata.model_dump(exclude={"sub_queries"})
+        
+        yield "done", True
+    
+    async def _prepare(
+        self,
+        query: str,
+        max_sources: int
+    ) -> Tuple[List[SubQuery], List[ValidatedChunk]]:
+        """
+        Plan, retrieve and validate context for a query.
+        
+        Args:
+            query: User's natural language query
+            max_sources: Maximum number of sources that will be used
+            
+        Returns:
+            Tuple of (sub_queries, validated_chunks) sorted by confidence
+        """
+        # Only the top max_sources chunks are used, keep some headroom for validation
+        chunk_budget = max_sources * 4
+        
         # Step 1: Plan - Decompose query into sub-queries
-        sub_queries = self.planner.plan(query)
+        sub_queries = await self.planner.plan(query)
         
-        # Step 2: Retrieve - Search vector store in parallel
-        chunks = self.retriever.retrieve_parallel(sub_queries, top_k=5)
+        # Step 2: Retrieve - one batched encode and one multi-vector search for
+        # all sub-queries, off the event loop
+        chunks = await asyncio.to_thread(
+            self.retriever.retrieve_parallel, sub_queries, top_k=5, max_return=chunk_budget
+        )
         
         # Step 3: Validate - Check chunk relevance
-        validated, missing_topics, needs_reretrieval = self.validator.validate_batch(
+        validated, missing_topics, needs_reretrieval = await self.validator.validate_batch(
             chunks, sub_queries, query
         )
         
         # Step 3b: Re-retrieve if needed (one retry with expanded queries)
         if needs_reretrieval:
             expanded_queries = self._expand_queries(sub_queries)
-            additional_chunks = self.retriever.retrieve_parallel(expanded_queries, top_k=3)
+            additional_chunks = await asyncio.to_thread(
+                self.retriever.retrieve_parallel, expanded_queries, top_k=3, max_return=chunk_budget
+            )
             validated.extend([
                 ValidatedChunk(chunk=chunk, confidence=chunk.relevance_score, reasoning="Retry retrieval")
                 for chunk in additional_chunks
@@ -76,14 +154,11 @@ class RAGPipeline:
             # Re-sort and deduplicate
             validated = self._deduplicate_validated(validated)
         
-        # Step 4: Synthesize - Generate response
-        answer = await self.synthesizer.synthesize(query, validated[:max_sources])
-        
-        # Calculate metadata
-        processing_time = int((time.time() - start_time) * 1000)
-        
-        # Convert to Source objects
-        sources = [
+        return sub_queries, validated
+    
+    def _build_sources(self, validated: List[ValidatedChunk], max_sources: int) -> List[Source]:
+        """Convert the top validated chunks to Source objects."""
+        return [
             Source(
                 document=vc.chunk.document,
                 section=vc.chunk.section,
@@ -92,20 +167,26 @@ class RAGPipeline:
             )
             for vc in validated[:max_sources]
         ]
+    
+    def _build_metadata(
+        self,
+        start_time: float,
+        query: str,
+        answer: str,
+        sub_queries: List[SubQuery],
+        validated: List[ValidatedChunk],
+        max_sources: int
+    ) -> QueryMetadata:
+        """Build query metadata once the answer is complete."""
+        processing_time = int((time.time() - start_time) * 1000)
         
-        metadata = QueryMetadata(
+        return QueryMetadata(
             processing_time_ms=processing_time,
-            tokens_used=self._estimate_tokens(query, answer, validated),
+            tokens_used=self._estimate_tokens(query, answer, validated[:max_sources]),
             confidence=self._calculate_confidence(validated),
             sub_queries=[sq.text for sq in sub_queries],
             model_used=self.settings.synthesizer_model
         )
-        
-        return RAGResult(
-            answer=answer,
-            sources=sources,
-            metadata=metadata
-        )
     
     def _expand_queries(self, sub_queries: List[SubQuery]) -> List[SubQuery]:
         """Expand queries with synonyms for better retrieval."""
@@ -120,22 +201,23 @@ class RAGPipeline:
         return expanded
     
     def _deduplicate_validated(self, validated: List[ValidatedChunk]) -> List[ValidatedChunk]:
-        """Remove duplicate chunks."""
-        seen_ids = set()
-        unique = []
+        """Remove duplicate chunks, keeping the first occurrence of each."""
+        unique: Dict[str, ValidatedChunk] = {}
         for vc in validated:
-            if vc.chunk.chunk_id not in seen_ids:
-                seen_ids.add(vc.chunk.chunk_id)
-                unique.append(vc)
-        return unique
+            unique.setdefault(vc.chunk.chunk_id, vc)
+        return list(unique.values())
     
-    def _estimate_tokens(self, query: str, answer: str, validated: List[ValidatedChunk]) -> int:
-        """Estimate total token usage."""
+    def _estimate_tokens(self, query: str, answer: str, sent: List[ValidatedChunk]) -> int:
+        """Estimate total token usage for the chunks sent to the synthesizer."""
         # Rough estimate: 1 token ≈ 4 characters
         query_tokens = len(query) // 4
         answer_tokens = len(answer) // 4
-        context_tokens = sum(len(vc.chunk.content) for vc in validated) // 4
-        return query_tokens + answer_tokens + context_tokens + 100  # Add overhead
+        system_tokens = len(SYNTH_SYSTEM) // 4
+        # The synthesizer prompts with only its top chunks, each truncated
+        chunk_chars = self.synthesizer.chunk_chars
+        sent = sent[:self.synthesizer.max_context_chunks]
+        context_tokens = sum(min(len(vc.chunk.content), chunk_chars) for vc in sent) // 4
+        return query_tokens + answer_tokens + system_tokens + context_tokens + 100  # Add overhead
     
     def _calculate_confidence(self, validated: List[ValidatedChunk]) -> float:
         """Calculate overall confidence score."""
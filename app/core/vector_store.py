@@ -6,7 +6,14 @@ from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 import numpy as np
 from pathlib import Path
-import hashlib
+import xxhash
+
+
+# Documents per collection.add call; bounds the nested-list copy of embeddings
+ADD_BATCH_SIZE = 1000
+
+# IDs fetched and deleted per round when emptying the collection
+DELETE_BATCH_SIZE = 1000
 
 
 class VectorStore:
@@ -34,38 +41,60 @@ class VectorStore:
         documents: List[str],
         embeddings: np.ndarray,
         metadatas: List[Dict[str, Any]],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        encoded_documents: Optional[List[bytes]] = None
     ) -> None:
-        """Add documents with their embeddings to the store."""
+        """
+        Add documents with their embeddings to the store.
+        
+        encoded_documents may carry the UTF-8 bytes of documents when the
+        caller already has them, so IDs are hashed without re-encoding.
+        """
         if ids is None:
             # Generate IDs from content hash
+            if encoded_documents is None:
+                encoded_documents = [doc.encode() for doc in documents]
             ids = [
-                hashlib.md5(doc.encode()).hexdigest()[:16]
-                for doc in documents
+                xxhash.xxh3_64_hexdigest(data)
+                for data in encoded_documents
             ]
         
-        # Convert embeddings to list for Chroma
-        embeddings_list = embeddings.tolist() if isinstance(embeddings, np.ndarray) else embeddings
-        
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings_list,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Add in batches, converting each slice of embeddings to lists for Chroma
+        # only when it is sent so the full matrix is never copied at once
+        for start in range(0, len(documents), ADD_BATCH_SIZE):
+            end = start + ADD_BATCH_SIZE
+            batch_embeddings = embeddings[start:end]
+            if isinstance(batch_embeddings, np.ndarray):
+                batch_embeddings = np.ascontiguousarray(batch_embeddings, dtype=np.float32).tolist()
+            
+            self.collection.add(
+                documents=documents[start:end],
+                embeddings=batch_embeddings,
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
     
     def query(
         self,
-        query_embedding: np.ndarray,
+        query_embeddings: np.ndarray,
         n_results: int = 10,
         where: Optional[Dict] = None
     ) -> Dict[str, Any]:
-        """Query the vector store for similar documents."""
-        # Convert to list if numpy array
-        query_list = query_embedding.tolist() if isinstance(query_embedding, np.ndarray) else query_embedding
+        """
+        Query the vector store for similar documents.
+        
+        Accepts a single embedding or a 2-D stack of embeddings; all rows are
+        searched in one Chroma call and results are lists indexed by query row.
+        """
+        # Chroma 0.4.x validates embeddings as Python lists, so an array is
+        # converted exactly once, at the stored float32 precision
+        if isinstance(query_embeddings, np.ndarray):
+            query_list = np.atleast_2d(query_embeddings).astype(np.float32, copy=False).tolist()
+        else:
+            query_list = query_embeddings
         
         results = self.collection.query(
-            query_embeddings=[query_list],
+            query_embeddings=query_list,
             n_results=n_results,
             where=where
         )
@@ -74,11 +103,13 @@ class VectorStore:
     
     def delete_all(self) -> None:
         """Delete all documents from the collection."""
-        self.client.delete_collection("documents")
-        self.collection = self.client.create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # Empty the collection in place, a page of IDs at a time, so the
+        # collection handle and its index stay alive for the next ingest
+        while True:
+            ids = self.collection.get(limit=DELETE_BATCH_SIZE, include=[])["ids"]
+            if not ids:
+                break
+            self.collection.delete(ids=ids)
     
     def count(self) -> int:
         """Get total number of documents."""
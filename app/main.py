@@ -6,7 +6,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import asyncio
-from typing import AsyncGenerator
+import json
+from typing import AsyncGenerator, List, Tuple
 
 from app.config import get_settings
 from app.models import (
@@ -16,18 +17,32 @@ from app.models import (
 from app.core.pipeline import RAGPipeline
 from app.core.vector_store import VectorStore
 from app.core.embeddings import EmbeddingGenerator
-from app.core.document_loader import load_documents, Document
+from app.core.document_loader import load_documents, preprocess_document, Document
 from app.utils.logger import get_logger, setup_logging
+from app.utils.groq_client import close_groq_client
 import time
-import hashlib
 
 # Setup logging
 setup_logging()
 logger = get_logger(__name__)
 
+# Settings are fixed for the process lifetime
+SETTINGS = get_settings()
+
 # Global pipeline instance
 pipeline: RAGPipeline = None
 
+# Serializes ingests so one run's reset never interleaves with another's adds
+_ingest_lock = asyncio.Lock()
+
+# Shared compact encoder for SSE payloads
+_json_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def _sse_frame(payload: dict) -> bytes:
+    """Encode a payload as a server-sent event frame."""
+    return b"data: " + _json_encoder.encode(payload).encode() + b"\n\n"
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -36,7 +51,6 @@ async def lifespan(app: FastAPI):
     
     # Startup
     logger.info("Starting up RAG API")
-    settings = get_settings()
     
     try:
         # Initialize pipeline
@@ -58,6 +72,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down RAG API")
+    await close_groq_client()
 
 
 # Create FastAPI app
@@ -78,13 +93,51 @@ app.add_middleware(
 )
 
 
+def _prepare_chunks(documents: List[Document]) -> Tuple[List[str], List[bytes], List[dict]]:
+    """
+    Split documents into paragraph chunks and drop duplicate content.
+    
+    Args:
+        documents: Loaded documents
+        
+    Returns:
+        Tuple of (chunks, UTF-8 encoded chunks, metadatas), in document order
+    """
+    all_chunks = []
+    all_encoded = []
+    all_metadatas = []
+    
+    # Exact 64-bit content fingerprints seen so far
+    seen = set()
+    
+    # Remove duplicates across all documents: keep the first occurrence
+    for doc in documents:
+        chunks, encoded_chunks, fingerprints, metadatas = preprocess_document(doc)
+        for chunk, encoded, fingerprint, metadata in zip(chunks, encoded_chunks, fingerprints, metadatas):
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            
+            all_chunks.append(chunk)
+            all_encoded.append(encoded)
+            all_metadatas.append(metadata)
+    
+    return all_chunks, all_encoded, all_metadatas
+
+
 async def ingest_documents_internal() -> IngestResponse:
-    """Internal function to ingest documents."""
+    """Internal function to ingest documents, one ingest at a time."""
+    async with _ingest_lock:
+        return await _ingest_documents()
+
+
+async def _ingest_documents() -> IngestResponse:
+    """Reload the docs directory into the vector store."""
     start_time = time.time()
     
     try:
         # Load documents
-        documents = load_documents("docs")
+        documents = await asyncio.to_thread(load_documents, "docs")
         logger.info(f"Loaded {len(documents)} documents")
         
         if not documents:
@@ -96,53 +149,23 @@ async def ingest_documents_internal() -> IngestResponse:
                 errors=["No documents found in docs/ directory"]
             )
         
-        # Clear existing
-        pipeline.vector_store.delete_all()
-        
-        # Process documents
-        all_chunks = []
-        all_embeddings = []
-        all_metadatas = []
-        
-        for doc in documents:
-            # Simple chunking by paragraphs
-            paragraphs = doc.content.split('\n\n')
-            
-            for i, para in enumerate(paragraphs):
-                if len(para.strip()) < 50:  # Skip short paragraphs
-                    continue
-                
-                all_chunks.append(para)
-                all_metadatas.append({
-                    "document": doc.path,
-                    "section": doc.metadata.get("title", "unknown"),
-                    "paragraph": i
-                })
-                
-        # Remove duplicates based on content
-        seen_content = set()
-        unique_chunks = []
-        unique_metadatas = []
-        
-        for chunk, metadata in zip(all_chunks, all_metadatas):
-            content_hash = hashlib.md5(chunk.strip().encode()).hexdigest()
-            if content_hash not in seen_content:
-                seen_content.add(content_hash)
-                unique_chunks.append(chunk)
-                unique_metadatas.append(metadata)
-        
-        all_chunks = unique_chunks
-        all_metadatas = unique_metadatas
+        # Split and deduplicate in a worker thread so the loop keeps serving queries
+        all_chunks, all_encoded, all_metadatas = await asyncio.to_thread(_prepare_chunks, documents)
         
-        # Generate embeddings in batches
+        # Generate embeddings in a worker thread; encode batches internally and a
+        # single call keeps the model to one forward pass at a time
         logger.info(f"Generating embeddings for {len(all_chunks)} chunks")
-        embeddings = pipeline.embedding_gen.embed(all_chunks)
+        embeddings = await asyncio.to_thread(pipeline.embedding_gen.embed, all_chunks)
         
-        # Add to vector store
-        pipeline.vector_store.add_documents(
+        # Replace the existing contents only once the new chunks are embedded, so
+        # queries served during ingestion keep searching the previous documents
+        await asyncio.to_thread(pipeline.vector_store.delete_all)
+        await asyncio.to_thread(
+            pipeline.vector_store.add_documents,
             documents=all_chunks,
             embeddings=embeddings,
-            metadatas=all_metadatas
+            metadatas=all_metadatas,
+            encoded_documents=all_encoded
         )
         
         processing_time = int((time.time() - start_time) * 1000)
@@ -175,8 +198,6 @@ async def ingest_documents_internal() -> IngestResponse:
 @app.get("/health", response_model=HealthStatus)
 async def health_check():
     """Health check endpoint."""
-    settings = get_settings()
-    
     dependencies = {
         "vector_store": {
             "status": "connected",
@@ -185,7 +206,7 @@ async def health_check():
         "llm_service": {
             "status": "available",
             "provider": "groq",
-            "model": settings.synthesizer_model
+            "model": SETTINGS.synthesizer_model
         }
     }
     
@@ -222,9 +243,7 @@ async def ingest(request: IngestRequest):
     """Document ingestion endpoint."""
     logger.info("Starting document ingestion", force=request.force)
     
-    if request.force:
-        pipeline.vector_store.delete_all()
-    
+    # Ingestion always clears the store first, under the ingest lock
     result = await ingest_documents_internal()
     return result
 
@@ -233,40 +252,15 @@ async def ingest(request: IngestRequest):
 async def query_stream(request: QueryRequest):
     """Streaming query endpoint for real-time responses."""
     
-    async def event_generator() -> AsyncGenerator[str, None]:
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         try:
-            # First send the answer
-            result = await pipeline.process(request.query, max_sources=request.max_sources)
-            
-            # Stream answer word by word
-            words = result.answer.split()
-            for word in words:
-                yield f'data: {{"token": "{word} "}}\n\n'
-                await asyncio.sleep(0.01)  # Small delay for streaming effect
-            
-            # Send sources
-            sources_data = [{
-                "document": s.document,
-                "section": s.section,
-                "relevance_score": s.relevance_score,
-                "content_preview": s.content_preview
-            } for s in result.sources]
-            yield f'data: {{"sources": {sources_data}}}\n\n'
-            
-            # Send metadata
-            metadata = {
-                "processing_time_ms": result.metadata.processing_time_ms,
-                "tokens_used": result.metadata.tokens_used,
-                "confidence": result.metadata.confidence,
-                "model_used": result.metadata.model_used
-            }
-            yield f'data: {{"metadata": {metadata}}}\n\n'
-            
-            # Send done event
-            yield 'data: {"done": true}\n\n'
+            # Forward answer tokens as the LLM produces them, then sources,
+            # metadata and the done marker
+            async for kind, payload in pipeline.astream(request.query, max_sources=request.max_sources):
+                yield _sse_frame({kind: payload})
             
         except Exception as e:
-            yield f'data: {{"error": "{str(e)}"}}\n\n'
+            yield _sse_frame({"error": str(e)})
     
     return StreamingResponse(
         event_generator(),
@@ -276,10 +270,12 @@ async def query_stream(request: QueryRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    settings = get_settings()
     uvicorn.run(
         "app.main:app",
-        host=settings.api_host,
-        port=settings.api_port,
-        reload=settings.debug
+        host=SETTINGS.api_host,
+        port=SETTINGS.api_port,
+        reload=SETTINGS.debug,
+        # The Chroma store lives in process memory, so extra workers would each
+        # hold (and ingest) their own copy; keep one until the store is shared
+        workers=1
     )
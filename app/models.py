@@ -3,7 +3,7 @@ Pydantic models for API requests and responses.
 """
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 class Source(BaseModel):
@@ -59,6 +59,6 @@ class IngestResponse(BaseModel):
 class HealthStatus(BaseModel):
     """Health check response."""
     status: str = Field(..., description="Overall health status")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     version: str = Field(default="1.0.0")
     dependencies: Dict[str, Any] = Field(default_factory=dict, description="Dependency statuses")
@@ -2,5 +2,6 @@
 Utils module.
 """
 from .logger import get_logger, setup_logging
+from .groq_client import get_groq_client, close_groq_client
 
-__all__ = ["get_logger", "setup_logging"]
\ No newline at end of file
+__all__ = ["get_logger", "setup_logging", "get_groq_client", "close_groq_client"]
\ No newline at end of file
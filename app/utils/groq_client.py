@@ -0,0 +1,39 @@
+"""
+Shared async Groq client.
+"""
+from typing import Optional
+import groq
+import httpx
+from app.config import get_settings
+
+
+# One long-lived HTTP client so concurrent requests share keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+_groq_client: Optional[groq.AsyncGroq] = None
+
+
+def get_groq_client() -> groq.AsyncGroq:
+    """Get the shared AsyncGroq client, creating it on first use."""
+    global _http_client, _groq_client
+    
+    if _groq_client is None:
+        settings = get_settings()
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+        )
+        _groq_client = groq.AsyncGroq(
+            api_key=settings.groq_api_key,
+            http_client=_http_client
+        )
+    
+    return _groq_client
+
+
+async def close_groq_client() -> None:
+    """Close the shared HTTP client."""
+    global _http_client, _groq_client
+    
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _groq_client = None
@@ -5,6 +5,12 @@ import structlog
 import logging
 import sys
 from typing import Any, Dict
+import orjson
+
+
+def _orjson_dumps(obj: Any, **kwargs: Any) -> str:
+    """Serialize a log event with orjson, returning str for stdlib logging."""
+    return orjson.dumps(obj, **kwargs).decode()
 
 
 def setup_logging(log_level: str = "INFO") -> None:
@@ -25,7 +31,7 @@ def setup_logging(log_level: str = "INFO") -> None:
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer() if log_level == "INFO" else structlog.dev.ConsoleRenderer(),
+            structlog.processors.JSONRenderer(serializer=_orjson_dumps) if log_level == "INFO" else structlog.dev.ConsoleRenderer(),
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),